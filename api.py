@@ -1,6 +1,7 @@
 from fastapi import FastAPI, File, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from typing import List
 import numpy as np
 from PIL import Image
@@ -9,8 +10,19 @@ import tensorflow as tf
 from tensorflow import keras
 import os
 import json
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import anyio.to_thread
+from anyio import CapacityLimiter
 
-app = FastAPI(title="Construction Defect Detection API")
+# orjson serializes responses (including NumPy scalars) much faster than stdlib json
+app = FastAPI(title="Construction Defect Detection API", default_response_class=ORJSONResponse)
+
+# Per-request diagnostics go through logger.debug so they cost nothing at INFO
+logger = logging.getLogger("api")
+logger.setLevel(logging.INFO)
 
 # Add CORS middleware
 app.add_middleware(
@@ -21,78 +33,416 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger JSON responses (bulk results) for clients that accept gzip
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
 # Global model variable
 model = None
 MODEL_PATH = "model.keras"
+
+# INFERENCE_BACKEND=tflite (default) serves through the TFLite interpreter
+# below; INFERENCE_BACKEND=xla runs the keras model as one XLA-compiled
+# tf.function instead (useful on GPU hosts, where TFLite has no delegate here)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "tflite")
+_xla_predict = None
+
+# TFLite interpreters converted from the keras model at startup (XNNPACK
+# delegate is applied by default on CPU), one per BATCH_BUCKETS size so none
+# ever has to be resized. Interpreters are not thread-safe, so every invoke
+# goes through _interpreter_lock.
+# MODEL_QUANTIZATION=fp16 (default, x86 servers) converts on startup;
+# MODEL_QUANTIZATION=int8 (ARM/edge builds) loads the full-integer model
+# produced offline by quantize.py.
+# Cached .tflite files are named after TFLITE_RECIPE_VERSION, so bumping it
+# whenever the conversion changes the model's inputs makes old files get
+# rebuilt rather than loaded (v2: Rescaling folded in, raw 0-255 pixels).
+interpreters = {}
+MODEL_QUANTIZATION = os.getenv("MODEL_QUANTIZATION", "fp16")
+TFLITE_RECIPE_VERSION = 2
+FP16_MODEL_PATH = f"model_fp16_v{TFLITE_RECIPE_VERSION}.tflite"
+INT8_MODEL_PATH = f"model_int8_v{TFLITE_RECIPE_VERSION}.tflite"
+TFLITE_MODEL_PATH = INT8_MODEL_PATH if MODEL_QUANTIZATION == "int8" else FP16_MODEL_PATH
+_input_detail = None
+_output_detail = None
+_interpreter_lock = threading.Lock()
 LABEL_MAP_PATH = "label_map.json"
 
+# Dynamic batching settings for /predict: concurrent requests are grouped
+# into one model call of up to MAX_BATCH_SIZE images, waiting at most
+# MAX_DELAY seconds for the batch to fill
+MAX_BATCH_SIZE = 16
+MAX_DELAY = 0.05
+# Model calls are padded up to one of these batch sizes (larger batches are
+# split into MAX_BATCH_SIZE slices), so backends only ever see fixed shapes
+BATCH_BUCKETS = (1, 2, 4, 8, MAX_BATCH_SIZE)
+
+# Per-image upload cap; uploads are read in UPLOAD_CHUNK_SIZE slices so an
+# oversized file is rejected before it is fully loaded into memory
+MAX_UPLOAD_BYTES = 8 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+class UploadTooLarge(Exception):
+    """Raised when an uploaded file exceeds MAX_UPLOAD_BYTES"""
+
+def physical_core_count() -> int:
+    """Physical cores this process may run on (respects container/cgroup cpusets)"""
+    try:
+        cpus = os.sched_getaffinity(0)
+    except AttributeError:
+        # No affinity API (macOS/Windows): logical CPU count
+        return os.cpu_count() or 1
+    # SMT siblings share one thread_siblings_list, so each core is counted once
+    cores = set()
+    for cpu in cpus:
+        try:
+            with open(f"/sys/devices/system/cpu/cpu{cpu}/topology/thread_siblings_list") as f:
+                cores.add(f.read().strip())
+        except OSError:
+            cores.add(str(cpu))
+    return len(cores) or 1
+
+# Inference thread count: TF_NUM_INTRAOP_THREADS if set, otherwise one
+# thread per physical core
+try:
+    NUM_THREADS = int(os.getenv("TF_NUM_INTRAOP_THREADS", 0)) or physical_core_count()
+except ValueError:
+    print(f"⚠ Warning: Ignoring non-numeric TF_NUM_INTRAOP_THREADS={os.getenv('TF_NUM_INTRAOP_THREADS')!r}")
+    NUM_THREADS = physical_core_count()
+
+# Only one model call runs at a time; concurrent requests wait here (or get
+# merged by the batching loop) instead of oversubscribing the CPU
+_infer_limiter = None
+
+# Worker threads for decoding/preprocessing bulk uploads in parallel
+# (PIL decode and resize release the GIL)
+_decode_pool = None
+
 # Class labels mapping (will be loaded from file)
 class_labels = {}
 idx_to_label = {}
+# Labels in model output order, so probabilities can be returned as a plain list
+_LABELS = []
+
+# Preprocessing target, read from model.input_shape once at startup so
+# preprocess_image is straight-line (defaults match IMAGE_SIZE in the notebook)
+_TARGET_HW = (128, 128)
+_FLATTEN = False
+_SAMPLE_SHAPE = (1, 128, 128, 3)
+# Smallest JPEG decode size (W, H) worth asking libjpeg for: twice the target
+_DRAFT_SIZE = (256, 256)
+
+# PREPROCESS_BACKEND=tf decodes and resizes uploads in a single
+# tf.function built at startup instead of going through PIL + NumPy. PIL stays
+# the default since it is what the training pipeline (ImageDataGenerator) used.
+PREPROCESS_BACKEND = os.getenv("PREPROCESS_BACKEND", "pil")
+_tf_preprocess = None
+
+def configure_input_shape(input_shape: tuple):
+    """Cache the resize target and output shape for the model's expected input"""
+    global _TARGET_HW, _FLATTEN, _SAMPLE_SHAPE, _DRAFT_SIZE
+    _FLATTEN = (len(input_shape) == 2)
+    if _FLATTEN:
+        # Flattened (dense) input: recover the square image size from H*W*3
+        img_dim = int(np.sqrt(input_shape[1] / 3))
+        _TARGET_HW = (img_dim, img_dim)
+        _SAMPLE_SHAPE = (1, -1)
+    else:
+        if input_shape[1] is not None and input_shape[2] is not None:
+            _TARGET_HW = (input_shape[1], input_shape[2])
+        _SAMPLE_SHAPE = (1, _TARGET_HW[0], _TARGET_HW[1], 3)
+    _DRAFT_SIZE = (_TARGET_HW[1] * 2, _TARGET_HW[0] * 2)
+
+def build_serving_model(keras_model: keras.Model) -> keras.Model:
+    """Prepend a Rescaling(1/255) layer so the model consumes raw uint8 pixels"""
+    # Same normalization as rescale=1./255 in ImageDataGenerator, done inside the model
+    if any(isinstance(layer, keras.layers.Rescaling) for layer in keras_model.layers):
+        return keras_model
+    return keras.Sequential([
+        keras.Input(shape=keras_model.input_shape[1:]),
+        keras.layers.Rescaling(1 / 255.0),
+        keras_model
+    ])
 
 def preprocess_image(image: Image.Image) -> np.ndarray:
     """Preprocess image for model prediction - matches training preprocessing exactly"""
+    # Let libjpeg decode large JPEGs at 1/2, 1/4 or 1/8 scale (no-op for other formats)
+    image.draft("RGB", _DRAFT_SIZE)
+    
     # Convert to RGB if necessary (same as ImageDataGenerator)
     if image.mode != "RGB":
         image = image.convert("RGB")
     
-    # Resize to 128x128 (same as IMAGE_SIZE in notebook)
-    image = image.resize((128, 128))
+    # Resize to the model input size (PIL takes width, height) and add the batch
+    # dimension; pixels stay uint8 since normalization happens in the model.
+    # BILINEAR is much cheaper than PIL's BICUBIC default at no accuracy cost here
+    image = image.resize((_TARGET_HW[1], _TARGET_HW[0]), Image.BILINEAR)
+    img_array = np.asarray(image, dtype=np.uint8)
+    return img_array.reshape(_SAMPLE_SHAPE)
+
+def build_tf_preprocess(target_hw: tuple):
+    """Build a graph-compiled decode + resize function operating on raw bytes"""
+    @tf.function(input_signature=[tf.TensorSpec([], tf.string)])
+    def _pp(contents):
+        x = tf.io.decode_image(contents, channels=3, expand_animations=False)
+        x = tf.image.resize(x, target_hw)
+        # Back to uint8 like the PIL path; the model does the rescaling
+        return tf.saturate_cast(tf.round(x), tf.uint8)
+    return _pp
+
+def load_image_array(contents: bytes) -> np.ndarray:
+    """Turn uploaded file bytes into a model-ready array with a batch dimension"""
+    if _tf_preprocess is not None:
+        return _tf_preprocess(tf.constant(contents)).numpy().reshape(_SAMPLE_SHAPE)
+    return preprocess_image(Image.open(io.BytesIO(contents)))
+
+async def read_upload(file: UploadFile) -> bytes:
+    """Read an upload in chunks, stopping as soon as it exceeds MAX_UPLOAD_BYTES"""
+    chunks = []
+    size = 0
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if size > MAX_UPLOAD_BYTES:
+            raise UploadTooLarge(f"File exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB upload limit")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+def _decode_and_preprocess(contents: bytes, filename: str) -> tuple:
+    """Decode one upload in a worker thread, returning (filename, array) or (filename, exception)"""
+    try:
+        return filename, load_image_array(contents)
+    except Exception as e:
+        return filename, e
+
+def convert_to_tflite(keras_model: keras.Model) -> bytes:
+    """Convert the keras model to a float16-quantized TFLite FlatBuffer"""
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    # Store weights as float16; ops still run in float32 on CPU
+    converter.target_spec.supported_types = [tf.float16]
+    return converter.convert()
+
+def load_tflite_model(keras_model: keras.Model) -> bytes:
+    """Return the TFLite model bytes, reusing the on-disk copy if it is newer than the keras model"""
+    if MODEL_QUANTIZATION == "int8":
+        # The int8 model needs a representative dataset, so it is never converted here
+        if not os.path.exists(TFLITE_MODEL_PATH):
+            raise Exception(f"{TFLITE_MODEL_PATH} not found - build it with quantize.py")
+        with open(TFLITE_MODEL_PATH, 'rb') as f:
+            return f.read()
     
-    # Convert to array and normalize to [0, 1] (same as rescale=1./255)
-    img_array = np.array(image, dtype=np.float32) / 255.0
+    if os.path.exists(TFLITE_MODEL_PATH) and os.path.getmtime(TFLITE_MODEL_PATH) >= os.path.getmtime(MODEL_PATH):
+        with open(TFLITE_MODEL_PATH, 'rb') as f:
+            return f.read()
     
-    # Add batch dimension
-    img_array = np.expand_dims(img_array, axis=0)
+    tflite_bytes = convert_to_tflite(keras_model)
+    try:
+        with open(TFLITE_MODEL_PATH, 'wb') as f:
+            f.write(tflite_bytes)
+    except OSError as e:
+        print(f"⚠ Warning: Could not cache TFLite model at {TFLITE_MODEL_PATH}: {str(e)}")
+    return tflite_bytes
+
+def check_tflite_input(input_detail: dict):
+    """Reject an int8 model calibrated on [0,1] floats instead of raw 0-255 pixels"""
+    # A 0-255 calibration gives an input scale of ~1.0; a [0,1] one gives ~1/255
+    if input_detail["dtype"] == np.int8 and input_detail["quantization"][0] < 0.1:
+        raise Exception(f"{TFLITE_MODEL_PATH} expects [0, 1] inputs - rebuild it with quantize.py")
+
+def _invoke_tflite(batch: np.ndarray) -> np.ndarray:
+    """Run the TFLite interpreter allocated for this batch size (one of BATCH_BUCKETS)"""
+    # Full-integer models take int8 input: q = x / scale + zero_point
+    if _input_detail["dtype"] == np.int8:
+        scale, zero_point = _input_detail["quantization"]
+        batch = np.clip(np.round(batch / scale + zero_point), -128, 127).astype(np.int8)
     
-    return img_array
+    interpreter = interpreters[len(batch)]
+    with _interpreter_lock:
+        # Write (and cast uint8 -> float32) straight into the interpreter's input
+        # buffer rather than allocating a float copy for set_tensor to copy again.
+        # The view is a temporary so no reference to the buffer outlives invoke().
+        np.copyto(interpreter.tensor(_input_detail["index"])(), batch, casting="unsafe")
+        interpreter.invoke()
+        output = interpreter.get_tensor(_output_detail["index"])
+    
+    # Dequantize int8 output back to probabilities: x = (q - zero_point) * scale
+    if _output_detail["dtype"] == np.int8:
+        scale, zero_point = _output_detail["quantization"]
+        output = (output.astype(np.float32) - zero_point) * scale
+    return output
+
+def build_xla_predict(keras_model: keras.Model):
+    """Compile the uint8 cast and forward pass into a single XLA-fused graph"""
+    # XLA still compiles once per concrete batch size; predict_batch only feeds
+    # BATCH_BUCKETS sizes, and warmup_model compiles each of them at startup
+    @tf.function(
+        input_signature=[tf.TensorSpec((None,) + tuple(keras_model.input_shape[1:]), tf.uint8)],
+        jit_compile=True
+    )
+    def _serve(batch):
+        # The model already ends in softmax, so its output is the probabilities
+        return keras_model(tf.cast(batch, tf.float32), training=False)
+    return _serve
+
+def _run_bucketed(run, batch: np.ndarray) -> np.ndarray:
+    """Call run() on batch zero-padded up to BATCH_BUCKETS sizes, returning only the real rows"""
+    outputs = []
+    for start in range(0, len(batch), MAX_BATCH_SIZE):
+        part = batch[start:start + MAX_BATCH_SIZE]
+        rows = len(part)
+        size = next(bucket for bucket in BATCH_BUCKETS if bucket >= rows)
+        if size != rows:
+            part = np.concatenate([part, np.zeros((size - rows,) + part.shape[1:], dtype=part.dtype)])
+        outputs.append(run(part)[:rows])
+    return outputs[0] if len(outputs) == 1 else np.concatenate(outputs)
 
-def predict_defect(img_array: np.ndarray) -> dict:
-    """Make prediction using the loaded model"""
+def predict_batch(batch: np.ndarray) -> np.ndarray:
+    """Run the model on a stacked (N, H, W, 3) uint8 batch and return the (N, classes) probabilities"""
     if model is None:
         raise Exception("Model not loaded")
     
-    # Log input shape for debugging
-    print(f"Input array shape: {img_array.shape}, range: [{img_array.min():.3f}, {img_array.max():.3f}]")
-    
-    # Get prediction - returns probabilities for all 7 classes
-    prediction = model.predict(img_array, verbose=0)
+    # Log input shape for debugging (min/max only computed when DEBUG is on)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Input array shape: %s, range: [%d, %d]", batch.shape, batch.min(), batch.max())
     
+    # One call for the whole batch - returns probabilities for all 7 classes per image
+    if interpreters:
+        return _run_bucketed(_invoke_tflite, batch)
+    if _xla_predict is not None:
+        # XLA compiles once per concrete batch size, so keep to the warmed-up buckets
+        return _run_bucketed(lambda part: _xla_predict(part).numpy(), batch)
+    return model.predict(batch, verbose=0, batch_size=len(batch))
+
+def _format_prediction(pred_vec: np.ndarray) -> dict:
+    """Build the response fields from a single row of model output"""
     # Log raw predictions
-    print(f"Raw predictions: {prediction[0]}")
-    print(f"Sum of probabilities: {prediction[0].sum():.4f}")
+    logger.debug("Raw predictions: %s", pred_vec)
     
-    # Get the class with highest probability
-    predicted_class_idx = int(np.argmax(prediction[0]))
-    confidence = float(np.max(prediction[0]))
+    # Get the class with highest probability (one pass, one boxed float)
+    predicted_class_idx = int(pred_vec.argmax())
+    confidence = pred_vec[predicted_class_idx].item()
     
     # Map index to class name
     predicted_class = idx_to_label.get(predicted_class_idx, "Unknown")
     
-    print(f"Predicted: {predicted_class} (index {predicted_class_idx}) with confidence {confidence:.4f}")
+    logger.debug("Predicted %s idx=%d conf=%.4f", predicted_class, predicted_class_idx, confidence)
     
     # Determine if it's a defect (anything except 'normal')
     has_defect = (predicted_class.lower() != "normal")
     
     return {
         "has_defect": has_defect,
+        "status": "defect" if has_defect else "clean",
         "defect_type": predicted_class,
         "confidence": confidence,
         "prediction": f"{predicted_class.replace('_', ' ').title()}" + (" (Defect Detected)" if has_defect else " (No Defect)"),
-        "all_probabilities": {
-            idx_to_label[i]: float(prediction[0][i]) for i in range(len(prediction[0]))
-        }
+        "probs": pred_vec.tolist(),
+        "labels": _LABELS
     }
 
+async def server_loop(queue: asyncio.Queue):
+    """Background consumer that groups queued (img_array, future) pairs into single model calls"""
+    loop = asyncio.get_running_loop()
+    while True:
+        # Block until at least one request arrives, then collect more until full or timed out
+        items = [await queue.get()]
+        deadline = loop.time() + MAX_DELAY
+        while len(items) < MAX_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        
+        try:
+            batch = np.concatenate([img_array for img_array, _ in items], axis=0)
+            # Run the model off the event loop so new requests keep queueing meanwhile
+            predictions = await anyio.to_thread.run_sync(predict_batch, batch, limiter=_infer_limiter)
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            continue
+        
+        for (_, future), pred_vec in zip(items, predictions):
+            if not future.done():
+                future.set_result(pred_vec)
+
+def warmup_model():
+    """Run dummy inferences so the first real request doesn't pay for lazy TF initialization"""
+    # Every model call is padded to one of BATCH_BUCKETS, so warming those covers all shapes
+    for batch_size in BATCH_BUCKETS:
+        predict_batch(np.zeros((batch_size,) + tuple(model.input_shape[1:]), dtype=np.uint8))
+    
+    if _tf_preprocess is not None:
+        _tf_preprocess(tf.io.encode_png(tf.zeros(_TARGET_HW + (3,), dtype=tf.uint8)))
+
+@app.on_event("startup")
+async def start_batcher():
+    """Start the dynamic batching consumer for /predict"""
+    global _infer_limiter
+    _infer_limiter = CapacityLimiter(1)
+    app.state.queue = asyncio.Queue()
+    app.state.batcher = asyncio.create_task(server_loop(app.state.queue))
+
+@app.on_event("startup")
+async def start_decode_pool():
+    """Create the thread pool used to preprocess bulk uploads"""
+    global _decode_pool
+    _decode_pool = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 2))
+
+@app.on_event("shutdown")
+async def stop_decode_pool():
+    """Shut down the bulk preprocessing thread pool"""
+    if _decode_pool is not None:
+        _decode_pool.shutdown(wait=False)
+
 @app.on_event("startup")
 async def load_model():
     """Load the model and label mapping on startup"""
-    global model, class_labels, idx_to_label
+    global model, interpreters, _input_detail, _output_detail, _xla_predict, _tf_preprocess, class_labels, idx_to_label, _LABELS
     try:
+        # Size TF's thread pools before the runtime initializes: intra-op uses
+        # every available core, inter-op stays at 1 so ops don't compete
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(NUM_THREADS)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        except RuntimeError as e:
+            print(f"⚠ Warning: Could not set TF thread counts: {str(e)}")
+        
         # Load model
         if os.path.exists(MODEL_PATH):
-            model = keras.models.load_model(MODEL_PATH)
+            model = build_serving_model(keras.models.load_model(MODEL_PATH))
             print(f"✓ Model loaded successfully from {MODEL_PATH}")
+            configure_input_shape(model.input_shape)
+            if PREPROCESS_BACKEND == "tf":
+                _tf_preprocess = build_tf_preprocess(_TARGET_HW)
+                print("✓ Using tf.function preprocessing")
+            
+            # Serve through TFLite (or XLA); fall back to keras if that fails
+            if INFERENCE_BACKEND == "xla":
+                _xla_predict = build_xla_predict(model)
+                print("✓ Using XLA-compiled inference")
+            else:
+                try:
+                    tflite_bytes = load_tflite_model(model)
+                    bucket_interpreters = {}
+                    for size in BATCH_BUCKETS:
+                        interpreter = tf.lite.Interpreter(model_content=tflite_bytes, num_threads=NUM_THREADS)
+                        input_shape = interpreter.get_input_details()[0]["shape"].copy()
+                        input_shape[0] = size
+                        interpreter.resize_tensor_input(interpreter.get_input_details()[0]["index"], input_shape)
+                        interpreter.allocate_tensors()
+                        bucket_interpreters[size] = interpreter
+                    _input_detail = interpreter.get_input_details()[0]
+                    _output_detail = interpreter.get_output_details()[0]
+                    check_tflite_input(_input_detail)
+                    interpreters = bucket_interpreters
+                    print(f"✓ TFLite interpreters ready ({TFLITE_MODEL_PATH}, batch sizes {BATCH_BUCKETS})")
+                except Exception as e:
+                    interpreters = {}
+                    print(f"⚠ Warning: TFLite conversion failed, using keras model: {str(e)}")
         else:
             print(f"⚠ Warning: Model file not found at {MODEL_PATH}")
         
@@ -108,9 +458,20 @@ async def load_model():
             # Fallback labels
             idx_to_label = {0: "algae", 1: "major_crack", 2: "minor_crack", 
                           3: "normal", 4: "peeling", 5: "spalling", 6: "stain"}
+        
+        _LABELS = [idx_to_label[i] for i in range(len(idx_to_label))]
             
     except Exception as e:
         print(f"✗ Error loading model/labels: {str(e)}")
+    
+    # Warm up last, so a failed warmup (e.g. OOM or an XLA compile error)
+    # never leaves the labels unloaded
+    if model is not None:
+        try:
+            warmup_model()
+            print("✓ Model warmed up")
+        except Exception as e:
+            print(f"⚠ Warning: Model warmup failed: {str(e)}")
 
 @app.get("/")
 def root():
@@ -131,35 +492,54 @@ def health_check():
         "status": "healthy",
         "model_loaded": model is not None,
         "model_path": MODEL_PATH,
+        "backend": "tflite" if interpreters else "xla" if _xla_predict is not None else "keras",
+        "quantization": MODEL_QUANTIZATION if interpreters else None,
         "classes": list(class_labels.keys()) if class_labels else []
     }
 
 @app.post("/predict")
-async def predict_single(file: UploadFile = File(...)):
+async def predict_single(file: UploadFile = File(...), verbose: bool = False):
     """
     Single image prediction endpoint.
-    Returns: prediction result
+    Returns: prediction result (?verbose=1 adds the all_probabilities dict)
     """
     try:
-        # Read and preprocess image
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
-        img_array = preprocess_image(image)
+        # Read the image, then decode/preprocess it on the decode pool so the
+        # event loop stays free for the batching loop to collect other requests
+        contents = await read_upload(file)
+        loop = asyncio.get_running_loop()
+        img_array = await loop.run_in_executor(_decode_pool, load_image_array, contents)
         
-        # Make prediction
-        result = predict_defect(img_array)
+        # Queue for the batching loop and wait for this image's row of the batch
+        future = loop.create_future()
+        await app.state.queue.put((img_array, future))
+        result = _format_prediction(await future)
         
-        return {
+        response = {
             "success": True,
             "prediction": result["prediction"],
             "has_defect": result["has_defect"],
+            "status": result["status"],
             "defect_type": result["defect_type"],
             "confidence": result["confidence"],
-            "all_probabilities": result["all_probabilities"]
+            "probs": result["probs"],
+            "labels": result["labels"]
         }
+        if verbose:
+            response["all_probabilities"] = dict(zip(result["labels"], result["probs"]))
+        # Returning the response directly skips FastAPI's jsonable_encoder pass
+        return ORJSONResponse(response)
         
+    except UploadTooLarge as e:
+        return ORJSONResponse(
+            status_code=413,
+            content={
+                "success": False,
+                "error": str(e)
+            }
+        )
     except Exception as e:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={
                 "success": False,
@@ -174,40 +554,66 @@ async def predict_bulk(files: List[UploadFile] = File(...)):
     Returns: JSON with image names and predictions
     """
     try:
-        results = []
+        # Error entries are filled in place so results keep the upload order
+        results = [None] * len(files)
+        arrays = []
+        positions = []
+        
+        # First pass: read every upload and preprocess them in parallel on the decode pool
+        loop = asyncio.get_running_loop()
         
-        for file in files:
+        async def read_and_preprocess(file: UploadFile) -> tuple:
             try:
-                # Read and preprocess image
-                contents = await file.read()
-                image = Image.open(io.BytesIO(contents))
-                img_array = preprocess_image(image)
-                
-                # Make prediction
-                prediction_result = predict_defect(img_array)
-                
-                results.append({
-                    "image_name": file.filename,
-                    "prediction": prediction_result["prediction"],
-                    "defect_type": prediction_result["defect_type"],
-                    "confidence": prediction_result["confidence"],
-                    "has_defect": prediction_result["has_defect"]
-                })
+                contents = await read_upload(file)
+            except UploadTooLarge as e:
+                return file.filename, e
+            return await loop.run_in_executor(_decode_pool, _decode_and_preprocess, contents, file.filename)
+        
+        decoded = await asyncio.gather(*[read_and_preprocess(file) for file in files])
+        
+        for i, (filename, img_array) in enumerate(decoded):
+            if isinstance(img_array, Exception):
+                results[i] = {
+                    "image_name": filename,
+                    "prediction": f"Error: {str(img_array)}"
+                }
+            else:
+                arrays.append(img_array)
+                positions.append(i)
+        
+        # Second pass: a single model call for all valid images
+        if arrays:
+            try:
+                predictions = await anyio.to_thread.run_sync(
+                    predict_batch, np.concatenate(arrays, axis=0), limiter=_infer_limiter
+                )
                 
+                for i, pred_vec in zip(positions, predictions):
+                    prediction_result = _format_prediction(pred_vec)
+                    results[i] = {
+                        "image_name": files[i].filename,
+                        "prediction": prediction_result["prediction"],
+                        "defect_type": prediction_result["defect_type"],
+                        "confidence": prediction_result["confidence"],
+                        "has_defect": prediction_result["has_defect"],
+                        "status": prediction_result["status"]
+                    }
+                    
             except Exception as e:
-                results.append({
-                    "image_name": file.filename,
-                    "prediction": f"Error: {str(e)}"
-                })
+                for i in positions:
+                    results[i] = {
+                        "image_name": files[i].filename,
+                        "prediction": f"Error: {str(e)}"
+                    }
         
-        return {
+        return ORJSONResponse({
             "success": True,
             "total_images": len(files),
             "results": results
-        }
+        })
         
     except Exception as e:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={
                 "success": False,
@@ -0,0 +1,69 @@
+"""
+Build a full-integer (int8) TFLite model for ARM/edge deployments.
+
+int8 kernels are much faster than float on ARM CPUs but slower on x86, so
+this model is only used when the API runs with MODEL_QUANTIZATION=int8.
+
+Usage:
+    python quantize.py --data-dir path/to/images
+"""
+import argparse
+import io
+import os
+import random
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from PIL import Image
+
+from api import INT8_MODEL_PATH, MODEL_PATH, build_serving_model, configure_input_shape, preprocess_image
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+def find_images(data_dir: str) -> list:
+    """Collect image paths under data_dir (searched recursively)"""
+    paths = []
+    for root, _, filenames in os.walk(data_dir):
+        for filename in filenames:
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(root, filename))
+    return paths
+
+def quantize(data_dir: str, output_path: str, num_samples: int = 100):
+    """Convert model.keras to an int8 TFLite model calibrated on images from data_dir"""
+    model = build_serving_model(keras.models.load_model(MODEL_PATH))
+    configure_input_shape(model.input_shape)
+
+    image_paths = find_images(data_dir)
+    if not image_paths:
+        raise Exception(f"No images found in {data_dir}")
+    image_paths = random.sample(image_paths, min(num_samples, len(image_paths)))
+
+    def representative_data_gen():
+        # Same preprocessing as the API so calibration ranges match serving inputs
+        for path in image_paths:
+            with open(path, 'rb') as f:
+                image = Image.open(io.BytesIO(f.read()))
+            yield [preprocess_image(image).astype(np.float32)]
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_data_gen
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    tflite_bytes = converter.convert()
+
+    with open(output_path, 'wb') as f:
+        f.write(tflite_bytes)
+    print(f"✓ int8 model written to {output_path} ({len(tflite_bytes) / 1e6:.1f} MB, {len(image_paths)} calibration images)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the int8 TFLite model")
+    parser.add_argument("--data-dir", required=True, help="Directory of representative training images")
+    parser.add_argument("--output", default=INT8_MODEL_PATH, help="Output TFLite file")
+    parser.add_argument("--num-samples", type=int, default=100, help="Number of calibration images")
+    args = parser.parse_args()
+
+    quantize(args.data_dir, args.output, args.num_samples)
@@ -1,12 +1,165 @@
 import streamlit as st
 import requests
-from PIL import Image
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import io
+import html
+import hashlib
 import os
+import asyncio
+import threading
+
+# orjson parses the (potentially large) bulk responses much faster than stdlib json
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 # API configuration - supports both local and production
 API_BASE_URL = os.getenv("API_URL", "https://web-production-a1a27.up.railway.app")
 API_URL = f"{API_BASE_URL}/predict"
+# requests and httpx already send Accept-Encoding: gzip, which the API honors
+HTTP_HEADERS = {"User-Agent": "streamlit-defects/1.0"}
+
+@st.cache_resource
+def get_session():
+    """Shared HTTP session so API calls reuse pooled keep-alive connections across reruns and users"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(HTTP_HEADERS)
+    return session
+
+def warm_up_api(session: requests.Session):
+    """Hit /health so the API container is awake and a TLS connection is pooled"""
+    try:
+        session.get(f"{API_BASE_URL}/health", timeout=5)
+    except requests.exceptions.RequestException:
+        pass
+
+# Bulk analysis sends /predict/bulk requests of BULK_CHUNK_SIZE images with at
+# most BULK_MAX_IN_FLIGHT in flight: far fewer round trips than one request per
+# image, without one huge request hitting the timeout or the API's memory
+BULK_CHUNK_SIZE = 16
+BULK_MAX_IN_FLIGHT = 3
+
+# Uploads are shrunk client-side before sending: the model only looks at
+# 128x128 pixels, so full-resolution phone photos are mostly wasted bandwidth
+UPLOAD_MAX_EDGE = 512
+UPLOAD_JPEG_QUALITY = 85
+
+def downscale_for_upload(file) -> bytes:
+    """Resize an uploaded image to at most UPLOAD_MAX_EDGE px and re-encode it as JPEG"""
+    # Imported lazily (like httpx below) so a cold start doesn't pay for it before any upload
+    from PIL import Image
+    
+    file.seek(0)
+    image = Image.open(file)
+    image.thumbnail((UPLOAD_MAX_EDGE, UPLOAD_MAX_EDGE), Image.LANCZOS)
+    buf = io.BytesIO()
+    image.convert("RGB").save(buf, "JPEG", quality=UPLOAD_JPEG_QUALITY, optimize=True)
+    return buf.getvalue()
+
+def bulk_upload_part(file) -> tuple:
+    """(bytes, mime) to send for one bulk file"""
+    try:
+        return downscale_for_upload(file), "image/jpeg"
+    except Exception:
+        # Send undecodable files as-is so /predict/bulk reports an error for that file alone
+        return file.getvalue(), file.type or "application/octet-stream"
+
+@st.cache_data(ttl=24 * 60 * 60, max_entries=512, show_spinner=False)
+def predict_image(file_bytes: bytes, mime: str, _name: str, _session: requests.Session) -> dict:
+    """POST an image to /predict, cached by content (the filename is not part of the key)"""
+    response = _session.post(API_URL, files={"file": (_name, file_bytes, mime)}, timeout=30)
+    # Raise on API errors so they are not cached
+    response.raise_for_status()
+    return json_loads(response.content)
+
+async def predict_all(files: list, on_result):
+    """POST files to /predict/bulk in chunks, calling on_result(done, start, rows) as each chunk finishes"""
+    import httpx
+    
+    bulk_url = f"{API_BASE_URL}/predict/bulk"
+    semaphore = asyncio.Semaphore(BULK_MAX_IN_FLIGHT)
+    
+    # The client is created per run: its connection pool is bound to the event
+    # loop, and each asyncio.run() call gets a fresh loop
+    limits = httpx.Limits(max_connections=BULK_MAX_IN_FLIGHT, max_keepalive_connections=BULK_MAX_IN_FLIGHT)
+    async with httpx.AsyncClient(http2=True, timeout=60, limits=limits, headers=HTTP_HEADERS) as client:
+        async def predict_chunk(start: int) -> tuple:
+            chunk = files[start:start + BULK_CHUNK_SIZE]
+            async with semaphore:
+                try:
+                    # Encoding is CPU work, keep it off the event loop
+                    parts = await asyncio.gather(*[asyncio.to_thread(bulk_upload_part, file) for file in chunk])
+                    response = await client.post(bulk_url, files=[
+                        ("files", (file.name, payload, mime))
+                        for file, (payload, mime) in zip(chunk, parts)
+                    ])
+                    if response.status_code != 200:
+                        error = f"{response.status_code} - {response.text}"
+                    else:
+                        result = json_loads(response.content)
+                        if result.get("success", False):
+                            return start, result.get("results", [])
+                        error = result.get("error", "Unknown error")
+                except httpx.ConnectError:
+                    error = f"Cannot connect to API at {API_BASE_URL}"
+                except httpx.TimeoutException:
+                    error = "Request timed out"
+                except Exception as e:
+                    # One failed chunk (timeout, 502) must not sink the rest of the batch
+                    error = str(e)
+            return start, [{"image_name": file.name, "prediction": f"Error: {error}"} for file in chunk]
+        
+        done = 0
+        tasks = [predict_chunk(start) for start in range(0, len(files), BULK_CHUNK_SIZE)]
+        for task in asyncio.as_completed(tasks):
+            start, items = await task
+            done += len(items)
+            on_result(done, start, items)
+
+# Bulk row icon and color, keyed by the API's status field
+STATUS_STYLES = {"defect": ("⚠️", "#ff4b4b"), "clean": ("✓", "#00cc66"), "unknown": ("❓", "#ffa500")}
+
+def row_status(item: dict) -> str:
+    """A row's status: defect, clean or unknown (errors)"""
+    # APIs deployed before the status field only send has_defect; error rows
+    # (from the API or a failed chunk) carry no defect_type
+    return item.get("status") or ("defect" if item.get("has_defect") else "clean" if "defect_type" in item else "unknown")
+
+def result_row_html(item: dict) -> str:
+    """HTML for one row of the bulk results list"""
+    # File names are user-supplied and rendered with unsafe_allow_html
+    image_name = html.escape(item.get("image_name", "Unknown"))
+    status = row_status(item)
+    icon, color = STATUS_STYLES.get(status, STATUS_STYLES["unknown"])
+    if status not in ("defect", "clean"):
+        # Error rows show the error message in place of type and confidence
+        return (
+            f"<div style='padding: 0.5rem; margin: 0.3rem 0; background-color: #1e2130; border-left: 3px solid {color};'>"
+            f"<span style='color: {color};'>{icon}</span> "
+            f"<strong>{image_name}</strong>: "
+            f"<span style='color: #a0a0a0;'>{html.escape(item.get('prediction', 'Error'))}</span>"
+            f"</div>"
+        )
+    
+    defect_type = item.get("defect_type", "Unknown")
+    confidence = item.get("confidence", 0) * 100
+    
+    return (
+        f"<div style='padding: 0.5rem; margin: 0.3rem 0; background-color: #1e2130; border-left: 3px solid {color};'>"
+        f"<span style='color: {color};'>{icon}</span> "
+        f"<strong>{image_name}</strong>: {defect_type.replace('_', ' ').title()} "
+        f"<span style='color: #a0a0a0;'>({confidence:.1f}%)</span>"
+        f"</div>"
+    )
 
 # Page configuration
 st.set_page_config(
@@ -16,15 +169,16 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# Custom CSS for dark mode styling
+# Warm up the API in the background on a session's first load, so the first
+# Analyze click doesn't pay for a cold start and TLS handshake
+if "warmed" not in st.session_state:
+    threading.Thread(target=warm_up_api, args=(get_session(),), daemon=True).start()
+    st.session_state["warmed"] = True
+
+# Custom CSS for dark mode styling (page background and text colors come from
+# the [theme] in .streamlit/config.toml, so they aren't re-sent on every rerun)
 st.markdown("""
     <style>
-    .main {
-        background-color: #0e1117;
-    }
-    .stApp {
-        background-color: #0e1117;
-    }
     h1 {
         color: #ffffff;
         text-align: center;
@@ -132,11 +286,16 @@ with tab1:
     )
 
     if uploaded_file is not None:
+        # Decode and re-encode once per upload; later reruns and Analyze clicks
+        # reuse the stored JPEG instead of parsing the original file again
+        if st.session_state.get("last_fid") != uploaded_file.file_id:
+            st.session_state["processed_bytes"] = downscale_for_upload(uploaded_file)
+            st.session_state["last_fid"] = uploaded_file.file_id
+        
         # Display the uploaded image
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
-            image = Image.open(uploaded_file)
-            st.image(image, caption="Uploaded Image", use_container_width=True)
+            st.image(st.session_state["processed_bytes"], caption="Uploaded Image", use_container_width=True)
         
         # Analyze button
         col1, col2, col3 = st.columns([1, 1, 1])
@@ -146,68 +305,64 @@ with tab1:
         if analyze_button:
             with st.spinner("Analyzing image..."):
                 try:
-                    # Prepare the file for API request
-                    uploaded_file.seek(0)
-                    files = {"file": (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
-                    
-                    # Make API request
-                    response = requests.post(API_URL, files=files, timeout=30)
+                    # Cached by image content, so re-analyzing the same image skips the API call
+                    result = predict_image(st.session_state["processed_bytes"], "image/jpeg", uploaded_file.name, get_session())
                     
-                    if response.status_code == 200:
-                        result = response.json()
+                    if result.get("success", False):
+                        # Display results
+                        st.markdown("<div class='result-box'>", unsafe_allow_html=True)
                         
-                        if result.get("success", False):
-                            # Display results
-                            st.markdown("<div class='result-box'>", unsafe_allow_html=True)
-                            
-                            # Defect status
-                            has_defect = result.get("has_defect", False)
-                            prediction_text = result.get("prediction", "Unknown")
-                            defect_type = result.get("defect_type", "Unknown")
-                            confidence = result.get("confidence", 0) * 100
+                        # Defect status
+                        has_defect = result.get("has_defect", False)
+                        prediction_text = result.get("prediction", "Unknown")
+                        defect_type = result.get("defect_type", "Unknown")
+                        confidence = result.get("confidence", 0) * 100
+                        # APIs deployed before labels/probs only return the all_probabilities dict
+                        if "labels" in result and "probs" in result:
+                            all_probs = dict(zip(result["labels"], result["probs"]))
+                        else:
                             all_probs = result.get("all_probabilities", {})
-                            
-                            if has_defect:
-                                st.markdown(
-                                    "<div class='defect-yes'>⚠️ Defect Detected</div>",
-                                    unsafe_allow_html=True
-                                )
-                            else:
-                                st.markdown(
-                                    "<div class='defect-no'>✓ No Defect Detected</div>",
-                                    unsafe_allow_html=True
-                                )
-                            
-                            # Prediction details
+                        
+                        if has_defect:
                             st.markdown(
-                                f"<div class='confidence-text'>Type: {defect_type.replace('_', ' ').title()}</div>",
+                                "<div class='defect-yes'>⚠️ Defect Detected</div>",
                                 unsafe_allow_html=True
                             )
+                        else:
                             st.markdown(
-                                f"<div class='confidence-text'>Confidence: {confidence:.2f}%</div>",
+                                "<div class='defect-no'>✓ No Defect Detected</div>",
                                 unsafe_allow_html=True
                             )
-                            
-                            # Visual confidence indicator
-                            st.markdown("<br>", unsafe_allow_html=True)
-                            st.progress(confidence/100, text=f"Model Confidence: {confidence:.2f}%")
-                            
-                            # Show all class probabilities
-                            if all_probs:
-                                st.markdown("<br><div style='color: #a0a0a0;'>All Class Probabilities:</div>", unsafe_allow_html=True)
-                                for class_name, prob in sorted(all_probs.items(), key=lambda x: x[1], reverse=True):
-                                    st.markdown(
-                                        f"<div style='color: #fafafa; font-size: 0.9rem;'>• {class_name.replace('_', ' ').title()}: {prob*100:.1f}%</div>",
-                                        unsafe_allow_html=True
-                                    )
-                            
-                            st.markdown("</div>", unsafe_allow_html=True)
-                        else:
-                            st.error(f"❌ Prediction failed: {result.get('error', 'Unknown error')}")
                         
+                        # Prediction details
+                        st.markdown(
+                            f"<div class='confidence-text'>Type: {defect_type.replace('_', ' ').title()}</div>",
+                            unsafe_allow_html=True
+                        )
+                        st.markdown(
+                            f"<div class='confidence-text'>Confidence: {confidence:.2f}%</div>",
+                            unsafe_allow_html=True
+                        )
+                        
+                        # Visual confidence indicator
+                        st.markdown("<br>", unsafe_allow_html=True)
+                        st.progress(confidence/100, text=f"Model Confidence: {confidence:.2f}%")
+                        
+                        # Show all class probabilities
+                        if all_probs:
+                            st.markdown("<br><div style='color: #a0a0a0;'>All Class Probabilities:</div>", unsafe_allow_html=True)
+                            for class_name, prob in sorted(all_probs.items(), key=lambda x: x[1], reverse=True):
+                                st.markdown(
+                                    f"<div style='color: #fafafa; font-size: 0.9rem;'>• {class_name.replace('_', ' ').title()}: {prob*100:.1f}%</div>",
+                                    unsafe_allow_html=True
+                                )
+                        
+                        st.markdown("</div>", unsafe_allow_html=True)
                     else:
-                        st.error(f"❌ API Error: {response.status_code} - {response.text}")
+                        st.error(f"❌ Prediction failed: {result.get('error', 'Unknown error')}")
                         
+                except requests.exceptions.HTTPError as e:
+                    st.error(f"❌ API Error: {e.response.status_code} - {e.response.text}")
                 except requests.exceptions.ConnectionError:
                     st.error("❌ Cannot connect to API. Please ensure the API server is running at http://localhost:8000")
                     st.info("💡 Start the API with: `uvicorn api:app --reload`")
@@ -230,14 +385,22 @@ with tab2:
     )
     
     if uploaded_files:
+        from PIL import Image
+        
         st.write(f"**{len(uploaded_files)} image(s) selected**")
         
-        # Show thumbnails
-        cols = st.columns(min(len(uploaded_files), 5))
-        for idx, file in enumerate(uploaded_files[:5]):
-            with cols[idx]:
-                img = Image.open(file)
-                st.image(img, caption=file.name, use_container_width=True)
+        # Show thumbnails as a single st.image grid
+        thumbnails = []
+        captions = []
+        for file in uploaded_files[:5]:
+            # Decode at reduced scale (JPEG DCT scaling) - previews never need full resolution
+            file.seek(0)
+            img = Image.open(file)
+            img.draft("RGB", (256, 256))
+            img.thumbnail((256, 256), Image.BILINEAR)
+            thumbnails.append(img)
+            captions.append(file.name)
+        st.image(thumbnails, caption=captions, width=120)
         
         if len(uploaded_files) > 5:
             st.caption(f"+ {len(uploaded_files) - 5} more images")
@@ -248,81 +411,75 @@ with tab2:
             bulk_analyze_button = st.button("🔍 Analyze All Images", use_container_width=True, type="primary", key="bulk_analyze")
         
         if bulk_analyze_button:
-            with st.spinner(f"Analyzing {len(uploaded_files)} images..."):
-                try:
-                    # Prepare files for bulk API request
-                    files = []
-                    for file in uploaded_files:
-                        file.seek(0)
-                        files.append(("files", (file.name, file.getvalue(), file.type)))
-                    
-                    # Make bulk API request
-                    bulk_url = f"{API_BASE_URL}/predict/bulk"
-                    response = requests.post(bulk_url, files=files, timeout=60)
+            try:
+                total = len(uploaded_files)
+                
+                # Group identical images by content hash so each is only analyzed once
+                buckets = {}
+                for idx, file in enumerate(uploaded_files):
+                    digest = hashlib.blake2b(file.getvalue(), digest_size=16).hexdigest()
+                    buckets.setdefault(digest, []).append(idx)
+                groups = list(buckets.values())
+                unique_files = [uploaded_files[group[0]] for group in groups]
+                
+                # Send chunked /predict/bulk requests and show rows as each chunk finishes
+                progress = st.progress(0.0, text=f"Analyzing {len(unique_files)} unique images...")
+                st.markdown("<div class='result-box'>", unsafe_allow_html=True)
+                st.markdown("### Analysis Results")
+                rows = st.empty().container()
+                
+                results_data = [None] * total
+                
+                def on_result(done: int, start: int, items: list):
+                    # Fan each unique result back out to every file with the same content
+                    finished = []
+                    for group, item in zip(groups[start:start + len(items)], items):
+                        for idx in group:
+                            results_data[idx] = {**item, "image_name": uploaded_files[idx].name}
+                            finished.append(results_data[idx])
+                    # One markdown element per chunk rather than one per row
+                    rows.markdown("".join(result_row_html(item) for item in finished), unsafe_allow_html=True)
+                    progress.progress(done / len(unique_files), text=f"Analyzed {done}/{len(unique_files)} unique images")
+                
+                asyncio.run(predict_all(unique_files, on_result))
+                
+                st.markdown("</div>", unsafe_allow_html=True)
+                
+                # Summary statistics (one pass over the rows, counted by status like the rows are styled)
+                defect_count = 0
+                no_defect_count = 0
+                first_error = None
+                for item in results_data:
+                    status = row_status(item)
+                    if status == "defect":
+                        defect_count += 1
+                    elif status == "clean":
+                        no_defect_count += 1
+                    elif first_error is None:
+                        first_error = item.get("prediction", "Error").removeprefix("Error: ")
+                error_count = total - defect_count - no_defect_count
+                
+                if error_count == total:
+                    st.error(f"❌ Bulk prediction failed: {first_error}")
+                    if "Cannot connect" in first_error:
+                        st.info("💡 Start the API with: `uvicorn api:app --reload`")
+                else:
+                    st.success(f"✅ Successfully analyzed {total - error_count} images")
+                    if error_count:
+                        st.warning(f"⚠️ {error_count} images failed: {first_error}")
+                
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.metric("Total Images", len(results_data))
+                with col2:
+                    st.metric("Defects Found", defect_count)
+                with col3:
+                    st.metric("No Defects", no_defect_count)
+                with col4:
+                    st.metric("Errors", error_count)
                     
-                    if response.status_code == 200:
-                        result = response.json()
-                        
-                        if result.get("success", False):
-                            st.success(f"✅ Successfully analyzed {result.get('total_images', 0)} images")
-                            
-                            # Display results in a table
-                            results_data = result.get("results", [])
-                            
-                            if results_data:
-                                st.markdown("<div class='result-box'>", unsafe_allow_html=True)
-                                st.markdown("### Analysis Results")
-                                
-                                # Create a formatted table
-                                for idx, item in enumerate(results_data, 1):
-                                    image_name = item.get("image_name", "Unknown")
-                                    prediction = item.get("prediction", "Unknown")
-                                    defect_type = item.get("defect_type", "Unknown")
-                                    confidence = item.get("confidence", 0) * 100
-                                    has_defect = item.get("has_defect", False)
-                                    
-                                    # Color code based on prediction
-                                    if has_defect:
-                                        icon = "⚠️"
-                                        color = "#ff4b4b"
-                                    else:
-                                        icon = "✓"
-                                        color = "#00cc66"
-                                    
-                                    st.markdown(
-                                        f"<div style='padding: 0.5rem; margin: 0.3rem 0; background-color: #1e2130; border-left: 3px solid {color};'>"
-                                        f"<span style='color: {color};'>{icon}</span> "
-                                        f"<strong>{image_name}</strong>: {defect_type.replace('_', ' ').title()} "
-                                        f"<span style='color: #a0a0a0;'>({confidence:.1f}%)</span>"
-                                        f"</div>",
-                                        unsafe_allow_html=True
-                                    )
-                                
-                                st.markdown("</div>", unsafe_allow_html=True)
-                                
-                                # Summary statistics
-                                defect_count = sum(1 for item in results_data if item.get("has_defect", False))
-                                no_defect_count = sum(1 for item in results_data if not item.get("has_defect", False))
-                                
-                                col1, col2, col3 = st.columns(3)
-                                with col1:
-                                    st.metric("Total Images", len(results_data))
-                                with col2:
-                                    st.metric("Defects Found", defect_count)
-                                with col3:
-                                    st.metric("No Defects", no_defect_count)
-                        else:
-                            st.error(f"❌ Bulk prediction failed: {result.get('error', 'Unknown error')}")
-                    else:
-                        st.error(f"❌ API Error: {response.status_code} - {response.text}")
-                        
-                except requests.exceptions.ConnectionError:
-                    st.error("❌ Cannot connect to API. Please ensure the API server is running at http://localhost:8000")
-                    st.info("💡 Start the API with: `uvicorn api:app --reload`")
-                except requests.exceptions.Timeout:
-                    st.error("❌ Request timed out. Please try again with fewer images.")
-                except Exception as e:
-                    st.error(f"❌ Error: {str(e)}")
+            except Exception as e:
+                st.error(f"❌ Error: {str(e)}")
 
 # Footer
 st.markdown("<br><br>", unsafe_allow_html=True)